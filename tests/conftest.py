@@ -0,0 +1,5 @@
+from os.path import dirname, join, realpath
+from sys import path
+
+# Genome App tools are run as top-level modules from tools/
+path.insert(0, join(dirname(dirname(realpath(__file__))), 'tools'))
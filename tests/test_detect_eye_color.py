@@ -0,0 +1,28 @@
+from pytest import importorskip
+
+importorskip('tabix')
+
+from detect_eye_color import (get_hirisplex_regions,  # noqa: E402
+                              read_hirisplex_model)
+from raw_genotype import get_raw_genotype_build  # noqa: E402
+
+
+def test_raw_genotype_regions_follow_genome_build(tmp_path):
+
+    data = read_hirisplex_model()
+
+    file_path = str(tmp_path / 'genome.txt')
+
+    for header, region in [
+        ('# reference human assembly build 37\n', '15:28365618-28365618'),
+        ('# GRCh38\n', '15:28120472-28120472'),
+        ('', '15:28365618-28365618'),
+    ]:
+        with open(file_path, 'w') as f:
+            f.write(header + 'rs12913832\t15\t1\tAA\n')
+
+        regions = get_hirisplex_regions(data,
+                                        get_raw_genotype_build(file_path))
+
+        assert regions.iloc[0] == region
+        assert len(regions) == len(data) - 1
@@ -0,0 +1,204 @@
+from gzip import open as gzip_open
+from itertools import product
+from json import load
+
+from numpy import allclose, array, eye, isclose
+from numpy.random import default_rng
+from pytest import importorskip, raises
+
+importorskip('tabix')
+
+import detect_eye_color  # noqa: E402
+from detect_eye_color import (  # noqa: E402
+    DEFAULT_GENOTYPE, compute_eye_color_probabilities,
+    compute_expected_eye_color_probabilities, detect_eye_color_from_dosages,
+    read_hirisplex_model)
+from vcf import (get_vcf_allele_dosage,  # noqa: E402
+                 get_vcf_allele_dosages_by_tabix)
+
+FORMAT = 'GT:DS:GP'
+
+
+class VCF:
+    """
+    pytabix handler over in-memory .VCF rows.
+    """
+
+    def __init__(self, vcf_rows):
+        self.vcf_rows = vcf_rows
+
+    def querys(self, region):
+        chrom, start_end = region.split(':')
+        return iter([
+            r for r in self.vcf_rows
+            if r[0] == chrom and r[1] == start_end.split('-')[0]
+        ])
+
+
+def get_coefficients():
+
+    data = read_hirisplex_model()
+
+    return data.iloc[:, 3], data.iloc[:, 4]
+
+
+def test_ds_and_gp_of_alt():
+
+    assert get_vcf_allele_dosage('G', 'A', 'A', 'DS', FORMAT,
+                                 '0|1:0.9:0.1,0.8,0.1') == 0.9
+    assert get_vcf_allele_dosage('G', 'A', 'A', 'GP', FORMAT,
+                                 '0|1:0.9:0.2,0.7,0.1') == [0.2, 0.7, 0.1]
+
+
+def test_ds_and_gp_of_ref_are_flipped():
+
+    assert isclose(
+        get_vcf_allele_dosage('G', 'A', 'G', 'DS', FORMAT,
+                              '0|1:0.9:0.2,0.7,0.1'), 2 - 0.9)
+    assert get_vcf_allele_dosage('G', 'A', 'G', 'GP', FORMAT,
+                                 '0|1:0.9:0.2,0.7,0.1') == [0.1, 0.7, 0.2]
+
+
+def test_allele_neither_ref_nor_alt():
+
+    assert get_vcf_allele_dosage('G', 'A', 'T', 'DS', FORMAT,
+                                 '0|1:0.9:0.2,0.7,0.1') is None
+
+
+def test_missing_values():
+
+    for field, sample in [
+        ('GT', './.:.:.'),
+        ('GT', '0/.:1:0,1,0'),
+        ('DS', '0|1:.:0,1,0'),
+        ('DS', '0|1:x:0,1,0'),
+        ('DS', '0|1:nan:0,1,0'),
+        ('GP', '0|1:1:.'),
+        ('GP', '0|1:1:0.5,.,0.5'),
+        ('GP', '0|1:1:0.5,0.5'),
+        ('GP', '0|1:1:0,0,0'),
+        ('GP', '0|1'),
+    ]:
+        assert get_vcf_allele_dosage('G', 'A', 'A', field, FORMAT,
+                                     sample) is None, (field, sample)
+
+
+def test_unseen_and_missing_variants_get_defaults():
+
+    data = read_hirisplex_model()
+    rsids, regions, alleles = [data.iloc[1:, i] for i in range(3)]
+
+    chrom, start = regions.iloc[1].split('-')[0].split(':')
+    vcf = VCF([[
+        chrom, start, rsids.iloc[1], 'G', alleles.iloc[1], '.', 'PASS', '.',
+        FORMAT, '0|1:1.5:0,0.5,0.5', '0|1:.:0,1,0'
+    ]])
+
+    dosages = get_vcf_allele_dosages_by_tabix(
+        vcf,
+        rsids,
+        regions,
+        alleles,
+        field='DS',
+        default_dosages=DEFAULT_GENOTYPE,
+        n_samples=3)
+
+    expected = array([DEFAULT_GENOTYPE] * 3, dtype=float)
+    expected[0, 1] = 1.5
+    assert (dosages == expected).all()
+
+    genotype_probabilities = get_vcf_allele_dosages_by_tabix(
+        vcf,
+        rsids,
+        regions,
+        alleles,
+        field='GP',
+        default_dosages=DEFAULT_GENOTYPE,
+        n_samples=2)
+
+    expected = eye(3)[[DEFAULT_GENOTYPE] * 2]
+    expected[0, 1] = [0, 0.5, 0.5]
+    expected[1, 1] = [0, 1, 0]
+    assert (genotype_probabilities == expected).all()
+
+
+def test_one_hot_gp_matches_hard_calls():
+
+    intermediate_coefficients, brown_coefficients = get_coefficients()
+
+    genotypes = default_rng(0).integers(0, 3, (20, 6))
+
+    expected = compute_eye_color_probabilities(
+        intermediate_coefficients, brown_coefficients, genotypes)
+    probabilities = compute_expected_eye_color_probabilities(
+        intermediate_coefficients, brown_coefficients, eye(3)[genotypes])
+
+    for color in expected:
+        assert allclose(probabilities[color], expected[color])
+
+
+def test_gp_expectation_in_chunks_matches_brute_force():
+
+    intermediate_coefficients, brown_coefficients = get_coefficients()
+
+    # Unnormalized, like rounded GP
+    genotype_probabilities = default_rng(0).dirichlet(
+        [1, 1, 1], size=(7, 6)) * 0.97
+
+    probabilities = compute_expected_eye_color_probabilities(
+        intermediate_coefficients,
+        brown_coefficients,
+        genotype_probabilities,
+        chunk_size=3)
+
+    normalized = genotype_probabilities / genotype_probabilities.sum(
+        axis=2, keepdims=True)
+    for s in range(7):
+        expected = dict.fromkeys(probabilities, 0)
+        for genotype in product(range(3), repeat=6):
+            weight = normalized[s, range(6), genotype].prod()
+            genotype_probabilities_ = compute_eye_color_probabilities(
+                intermediate_coefficients, brown_coefficients,
+                array([genotype]))
+            for color in expected:
+                expected[color] += weight * genotype_probabilities_[color][0]
+
+        for color in expected:
+            assert isclose(probabilities[color][s], expected[color])
+
+    assert allclose(sum(probabilities.values()), 1)
+
+
+def test_zero_sum_gp_raises():
+
+    intermediate_coefficients, brown_coefficients = get_coefficients()
+
+    with raises(ValueError):
+        compute_expected_eye_color_probabilities(
+            intermediate_coefficients, brown_coefficients,
+            eye(3)[[[0] * 6]] * 0)
+
+
+def test_cohort_results_are_keyed_by_sample(tmp_path, monkeypatch):
+
+    with gzip_open(str(tmp_path / 'genome.vcf.gz'), 'wt') as f:
+        f.write('##fileformat=VCFv4.2\n'
+                '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t'
+                'S1\tS2\n')
+
+    monkeypatch.setattr(detect_eye_color, 'PERSON_DIRECTORY_PATH',
+                        str(tmp_path))
+    monkeypatch.setattr(detect_eye_color, 'OUTPUT_DIRECTORY_PATH',
+                        str(tmp_path))
+    monkeypatch.setattr(
+        detect_eye_color, 'get_vcf_allele_dosages_by_tabix',
+        lambda sample_vcf, *args, **kwargs: get_vcf_allele_dosages_by_tabix(
+            VCF([]), *args, **kwargs))
+
+    detect_eye_color_from_dosages(field='DS')
+
+    with open(str(tmp_path / 'output.json')) as f:
+        result = load(f)['Result']
+
+    assert sorted(result) == ['S1', 'S2']
+    assert result['S1'] == result['S2']
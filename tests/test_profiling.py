@@ -0,0 +1,112 @@
+from importlib import import_module
+from sys import modules
+from types import ModuleType
+
+from pytest import fixture, importorskip, raises
+
+from profiling import (LATENCY_BINS, LATENCY_FUNCTIONS,
+                       TRACEMALLOC_QUERY_FUNCTIONS, make_latency_histogram,
+                       make_latency_wrapper, parse_profile_modes,
+                       parse_sample_every, patch_function, profile_genome_app)
+
+
+@fixture
+def module():
+
+    module = ModuleType('profiling_test_module')
+    module.lookup = lambda x: x + 1
+    modules[module.__name__] = module
+
+    yield module
+
+    del modules[module.__name__]
+
+
+def test_parse_profile_modes():
+
+    assert parse_profile_modes(None) == []
+    assert parse_profile_modes('') == []
+    assert parse_profile_modes(' Latency, cprofile ') == [
+        'latency', 'cprofile'
+    ]
+    assert parse_profile_modes('latency,all') == [
+        'cprofile', 'tracemalloc', 'latency'
+    ]
+
+    with raises(ValueError):
+        parse_profile_modes('latency,heap')
+
+
+def test_parse_sample_every():
+
+    assert parse_sample_every(None) == 1
+    assert parse_sample_every('') == 1
+    assert parse_sample_every('10') == 10
+    assert parse_sample_every(3) == 3
+
+    for sample_every in ['0', '-2', '1.5', 'x', 0]:
+        with raises(ValueError):
+            parse_sample_every(sample_every)
+
+
+def test_make_latency_histogram():
+
+    histograms = make_latency_histogram([('a', 0.05), ('a', 3), ('a', 7000),
+                                         ('b', 0.5)])
+
+    assert sorted(histograms) == ['a', 'b']
+
+    a = histograms['a']
+    assert (a['n'], a['min_ms'], a['median_ms'], a['max_ms']) == (3, 0.05, 3,
+                                                                  7000)
+    assert a['histogram']['<=0.1ms'] == 1
+    assert a['histogram']['<=5ms'] == 1
+    assert a['histogram']['>{}ms'.format(LATENCY_BINS[-1])] == 1
+    assert sum(a['histogram'].values()) == 3
+
+    assert histograms['b']['histogram']['<=0.5ms'] == 1
+
+
+def test_patch_function_undo(module):
+
+    lookup = module.lookup
+    latencies = []
+
+    undo = patch_function(module.__name__, 'lookup',
+                          make_latency_wrapper(latencies, 2))
+
+    assert module.lookup is not lookup
+    assert [module.lookup(i) for i in range(5)] == [1, 2, 3, 4, 5]
+    assert len(latencies) == 3
+
+    undo()
+
+    assert module.lookup is lookup
+
+
+def test_profile_genome_app_leaves_functions_unwrapped(tmp_path):
+
+    importorskip('tabix')
+
+    functions = {
+        (module_name, function_name):
+        getattr(import_module(module_name), function_name)
+        for module_name, function_name in LATENCY_FUNCTIONS +
+        TRACEMALLOC_QUERY_FUNCTIONS
+    }
+
+    def fail():
+        raise RuntimeError
+
+    for function in [lambda: None, fail]:
+        try:
+            profile_genome_app(function, ['tracemalloc', 'latency'],
+                               str(tmp_path))
+        except RuntimeError:
+            pass
+
+        for (module_name, function_name), f in functions.items():
+            assert getattr(import_module(module_name), function_name) is f
+
+    assert (tmp_path / 'latency.json').exists()
+    assert (tmp_path / 'tracemalloc.txt').exists()
@@ -0,0 +1,141 @@
+from mmap import ACCESS_READ, mmap
+from os import utime
+from os.path import isfile
+
+from numpy import load
+
+from raw_genotype import (RSID_INDEX_SUFFIX, get_raw_genotype_build,
+                          get_raw_genotypes, get_rsid_index)
+
+HEADER = ('# This data file generated by 23andMe\n'
+          '# More information on reference human assembly build 37\n'
+          '# rsid\tchromosome\tposition\tgenotype\n')
+
+ROWS = [
+    ('rs1', '1', 100, 'AA'),
+    ('rs2', '1', 200, 'AG'),
+    ('rs3', '2', 50, 'CC'),
+    ('rs4', '2', 50, 'CT'),
+    ('rs5', 'X', 10, 'GG'),
+    ('rs6', 'MT', 500, 'TT'),
+]
+
+
+def write_raw_genotype_file(tmp_path, rows=ROWS, header=HEADER,
+                            newline='\n'):
+
+    file_path = str(tmp_path / 'genome.txt')
+
+    with open(file_path, 'w', newline='') as f:
+        f.write(header.replace('\n', newline))
+        for row in rows:
+            f.write('\t'.join(str(field) for field in row) + newline)
+
+    return file_path
+
+
+def get(file_path, *rows):
+
+    return get_raw_genotypes(
+        file_path, [row[0] for row in rows],
+        ['{}:{}-{}'.format(row[1], row[2], row[2]) for row in rows])
+
+
+def test_header_only_file(tmp_path):
+
+    file_path = write_raw_genotype_file(tmp_path, rows=[])
+
+    assert get(file_path, ROWS[0]) == {}
+
+
+def test_empty_file(tmp_path):
+
+    file_path = write_raw_genotype_file(tmp_path, rows=[], header='')
+
+    assert get(file_path, ROWS[0]) == {}
+
+
+def test_first_and_last_lines(tmp_path):
+
+    file_path = write_raw_genotype_file(tmp_path)
+
+    assert get(file_path, ROWS[0], ROWS[-1]) == {'rs1': 'AA', 'rs6': 'TT'}
+    assert not isfile(file_path + RSID_INDEX_SUFFIX)
+
+
+def test_first_line_without_header(tmp_path):
+
+    file_path = write_raw_genotype_file(tmp_path, header='')
+
+    assert get(file_path, ROWS[0]) == {'rs1': 'AA'}
+
+
+def test_duplicate_positions(tmp_path):
+
+    file_path = write_raw_genotype_file(tmp_path)
+
+    assert get(file_path, ROWS[2], ROWS[3]) == {'rs3': 'CC', 'rs4': 'CT'}
+    assert not isfile(file_path + RSID_INDEX_SUFFIX)
+
+
+def test_crlf_line_endings(tmp_path):
+
+    file_path = write_raw_genotype_file(tmp_path, newline='\r\n')
+
+    assert get(file_path, *ROWS) == {row[0]: row[3] for row in ROWS}
+
+
+def test_no_calls(tmp_path):
+
+    file_path = write_raw_genotype_file(
+        tmp_path,
+        rows=[('rs1', '1', 100, '--'), ('rs2', '1', 200, '0\t0'),
+              ('rs3', '2', 50, 'A\tG'), ('rs4', '2', 60, 'NN')],
+        header='#AncestryDNA\nrsid\tchromosome\tposition\tallele1\tallele2\n')
+
+    assert get(file_path, *ROWS[:4]) == {'rs3': 'AG'}
+
+
+def test_rsid_index_fallback(tmp_path):
+
+    file_path = write_raw_genotype_file(
+        tmp_path, header='# caf\xe9 without tabs\n' + HEADER)
+
+    # Position of another genome build
+    assert get(file_path, ('rs2', '1', 999)) == {'rs2': 'AG'}
+    assert isfile(file_path + RSID_INDEX_SUFFIX)
+
+
+def test_missing_rsid_index_is_made(tmp_path):
+
+    file_path = write_raw_genotype_file(tmp_path)
+
+    with open(file_path, 'rb') as f, mmap(
+            f.fileno(), 0, access=ACCESS_READ) as m:
+        index = get_rsid_index(file_path, m)
+
+    assert sorted(index[:, 0].tolist()) == [1, 2, 3, 4, 5, 6]
+    assert (load(file_path + RSID_INDEX_SUFFIX) == index).all()
+
+
+def test_stale_rsid_index_is_remade(tmp_path):
+
+    file_path = write_raw_genotype_file(tmp_path)
+    assert get(file_path, ('rs5', 'X', 999)) == {'rs5': 'GG'}
+
+    # Rewrite the file with rs5 at another offset and make the index older
+    file_path = write_raw_genotype_file(
+        tmp_path, rows=[('rs0', '1', 1, 'CC')] + ROWS[:4] +
+        [('rs5', 'X', 10, 'AT')])
+    utime(file_path + RSID_INDEX_SUFFIX, (0, 0))
+
+    assert get(file_path, ('rs5', 'X', 999)) == {'rs5': 'AT'}
+
+
+def test_genome_build(tmp_path):
+
+    assert get_raw_genotype_build(write_raw_genotype_file(tmp_path)) == 37
+    assert get_raw_genotype_build(
+        write_raw_genotype_file(tmp_path, header='# GRCh38\n')) == 38
+    assert get_raw_genotype_build(
+        write_raw_genotype_file(tmp_path, header='')) == 37
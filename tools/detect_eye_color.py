@@ -1,11 +1,14 @@
 from pandas import read_csv
-from numpy import array, dot
-from math import exp
+from numpy import array, column_stack, dot, empty, ones
+from numpy import exp as numpy_exp
+from itertools import product
 from json import dump
 from pprint import pprint
 
-from os.path import basename, dirname, join, realpath
-from vcf import get_vcf_variants_by_tabix
+from os.path import basename, dirname, isfile, join, realpath
+from raw_genotype import get_raw_genotype_build, get_raw_genotypes
+from vcf import (get_vcf_allele_dosages_by_tabix, get_vcf_sample_names,
+                 get_vcf_variants_by_tabix)
 
 GENOME_APP_DIRECTORY_PATH = dirname(dirname(realpath(__file__)))
 
@@ -19,6 +22,9 @@ TOOLS_DIRECTORY_PATH = join(GENOME_APP_DIRECTORY_PATH, 'tools')
 OUTPUT_DIRECTORY_PATH = join(GENOME_APP_DIRECTORY_PATH, 'output')
 MEDIA_DIRECTORY_PATH = join(GENOME_APP_DIRECTORY_PATH, 'media')
 
+# Allele counts assumed for variants not seen: homozygous for the major allele
+DEFAULT_GENOTYPE = [2, 0, 0, 2, 0, 0]
+
 
 def create_genome_app_output():
     """
@@ -35,49 +41,159 @@ def create_genome_app_output():
     return output
 
 
-def detect_eye_color():
+def compute_eye_color_probabilities(intermediate_coefficients,
+                                    brown_coefficients, dosages):
     """
-    Note:
-        If the variant is not seen in the VCF file, the individual is assumed to be homozygous for the major allele at
-        that loci.
+    Compute HIrisPlex eye color probabilities for many samples at once.
+    :param intermediate_coefficients: iterable; (1 + n_variants); constant
+        followed by per-variant coefficients for intermediate
+    :param brown_coefficients: iterable; (1 + n_variants); constant followed
+        by per-variant coefficients for brown
+    :param dosages: ndarray; (n_samples, n_variants); allele dosages
+    :return: dict; {'intermediate': ndarray, 'brown': ndarray,
+        'blue': ndarray}; each (n_samples)
     """
 
-    input_file = join(INPUT_DIRECTORY_PATH, 'input.txt')
-    vcf_file_path = join(PERSON_DIRECTORY_PATH, 'genome.vcf.gz')
-    data = read_csv(input_file, sep='\t')
+    input_vectors = column_stack([ones(dosages.shape[0]), dosages])
 
-    genotype = [2, 0, 0, 2, 0, 0]
+    intermediate = numpy_exp(dot(input_vectors, array(intermediate_coefficients)))
+    brown = numpy_exp(dot(input_vectors, array(brown_coefficients)))
+    total = 1 + intermediate + brown
 
-    for i, row in data.iloc[1:, 0:3].iterrows():
+    return {
+        'intermediate': intermediate / total,
+        'brown': brown / total,
+        'blue': 1 - (brown / total) - (intermediate / total)
+    }
 
-        rsid, region, allele = row
 
-        variant = get_vcf_variants_by_tabix(vcf_file_path, query_str=region)
+def compute_expected_eye_color_probabilities(intermediate_coefficients,
+                                             brown_coefficients,
+                                             genotype_probabilities,
+                                             chunk_size=4096):
+    """
+    Compute HIrisPlex eye color probabilities for many samples at once,
+        averaged over every genotype combination weighted by its probability.
+    :param intermediate_coefficients: iterable; (1 + n_variants); constant
+        followed by per-variant coefficients for intermediate
+    :param brown_coefficients: iterable; (1 + n_variants); constant followed
+        by per-variant coefficients for brown
+    :param genotype_probabilities: ndarray; (n_samples, n_variants, 3);
+        probabilities of carrying 0, 1, and 2 alleles; each triplet is
+        normalized to sum to 1 and must not sum to 0
+    :param chunk_size: int; number of samples weighted at once; bounds memory
+        to (chunk_size, 3 ** n_variants) floats
+    :return: dict; {'intermediate': ndarray, 'brown': ndarray,
+        'blue': ndarray}; each (n_samples)
+    """
 
-        if variant and rsid in [x['ID'] for x in variant]:
-            genotype[i] = [x for x in variant if x['ID'] == rsid
-                           ][0]['sample'][0]['genotype'].count(allele)
+    n_samples, n_variants, _ = genotype_probabilities.shape
 
-    input_vector = array([1] + genotype)
+    # (3 ** n_variants, n_variants) allele counts of every genotype combination
+    combinations = array(list(product(range(3), repeat=n_variants)))
 
-    intermediate = exp(dot(array(data.iloc[:, 3]), array(input_vector)))
-    brown = exp(dot(array(data.iloc[:, 4]), array(input_vector)))
-    total = 1 + intermediate + brown
+    # (3 ** n_variants) probabilities of every genotype combination
+    probabilities = compute_eye_color_probabilities(
+        intermediate_coefficients, brown_coefficients, combinations)
 
-    probability = {
-        'intermediate': float(intermediate) / total,
-        'brown': float(brown) / total,
-        'blue': 1 - (float(brown) / total) - (float(intermediate) / total)
+    expected_probabilities = {
+        color: empty(n_samples)
+        for color in probabilities
     }
+
+    for chunk_start in range(0, n_samples, chunk_size):
+        chunk = slice(chunk_start, min(chunk_start + chunk_size, n_samples))
+
+        # Rounded GP may not sum to 1; normalize each triplet
+        chunk_genotype_probabilities = genotype_probabilities[chunk]
+        sums = chunk_genotype_probabilities.sum(axis=2, keepdims=True)
+        if not (0 < sums).all():
+            raise ValueError(
+                'Genotype probabilities must not sum to 0; treat them as '
+                'missing.')
+        chunk_genotype_probabilities = chunk_genotype_probabilities / sums
+
+        # (chunk_size, 3 ** n_variants) probability of every genotype
+        # combination
+        weights = ones((chunk.stop - chunk.start, len(combinations)))
+        for i in range(n_variants):
+            weights *= chunk_genotype_probabilities[:, i, combinations[:, i]]
+
+        for color, color_probabilities in probabilities.items():
+            expected_probabilities[color][chunk] = dot(weights,
+                                                       color_probabilities)
+
+    return expected_probabilities
+
+
+def read_hirisplex_model():
+    """
+    Read HIrisPlex model: rsid, GRCh38 region, allele, intermediate & brown
+        coefficients, and GRCh37 region, with the constant on the first row.
+    :return: DataFrame; (1 + n_variants, 6)
+    """
+
+    return read_csv(join(INPUT_DIRECTORY_PATH, 'input.txt'), sep='\t')
+
+
+def get_hirisplex_regions(data, build):
+    """
+    Get HIrisPlex variant regions in a genome build.
+    :param data: DataFrame; HIrisPlex model (see read_hirisplex_model)
+    :param build: int; genome build: 38 | 37; builds other than 38 use GRCh37
+    :return: Series; (n_variants); of str genomic regions: 'chr:start-end'
+    """
+
+    if build == 38:
+        return data.iloc[1:, 1]
+    else:
+        return data.iloc[1:, 5]
+
+
+def describe_eye_color(probability):
+    """
+    Describe the most probable eye color.
+    :param probability: dict; {'intermediate': float, 'brown': float,
+        'blue': float}
+    :return: str; result
+    """
+
     color = max(probability, key=probability.get)
     result = "{0:.2f}".format(
         probability[color] *
         100) + '% probability of having {} colored eyes.'.format(color)
 
+    return "Based on the HIrisPlex model, a person with these genomic features would have a {}".format(result)
+
+
+def describe_eye_colors(probabilities):
+    """
+    Describe the most probable eye color of every sample.
+    :param probabilities: dict; {'intermediate': ndarray, 'brown': ndarray,
+        'blue': ndarray}; each (n_samples)
+    :return: list; (n_samples); of str results
+    """
+
+    return [
+        describe_eye_color({
+            color: float(color_probabilities[i])
+            for color, color_probabilities in probabilities.items()
+        }) for i in range(len(probabilities['blue']))
+    ]
+
+
+def write_genome_app_output(result, variants_searched):
+    """
+    Write output.json and summarize it.
+    :param result: str | dict; result, or {sample name: result} for a cohort
+    :param variants_searched: iterable; of str variant IDs
+    :return: None
+    """
+
     output = create_genome_app_output()
 
-    output['Result'] = "Based on the HIrisPlex model, a person with these genomic features would have a {}".format(result)
-    output['Variants searched'] = ', '.join(data.iloc[1:, 0])
+    output['Result'] = result
+    output['Variants searched'] = ', '.join(variants_searched)
 
     output_json_file_path = join(OUTPUT_DIRECTORY_PATH, 'output.json')
     with open(output_json_file_path, 'w') as f:
@@ -86,3 +202,99 @@ def detect_eye_color():
     # Summarize
     print('This Genome App ran and produced {}.'.format(output_json_file_path))
     pprint(output)
+
+
+def detect_eye_color_from_dosages(field='DS'):
+    """
+    Detect eye color of every sample in the VCF file from imputed dosages.
+    :param field: str; .VCF FORMAT field: 'DS' (expected allele dosage) |
+        'GP' (genotype probabilities)
+    Note:
+        See detect_eye_color for variants not seen in the VCF file.
+        With more than one sample, the result is {sample name: result}.
+    """
+
+    vcf_file_path = join(PERSON_DIRECTORY_PATH, 'genome.vcf.gz')
+    data = read_hirisplex_model()
+
+    rsids, regions, alleles = [data.iloc[1:, i] for i in range(3)]
+
+    sample_names = get_vcf_sample_names(vcf_file_path)
+
+    dosages = get_vcf_allele_dosages_by_tabix(
+        vcf_file_path,
+        rsids,
+        regions,
+        alleles,
+        field=field,
+        default_dosages=DEFAULT_GENOTYPE,
+        n_samples=len(sample_names))
+
+    if field == 'GP':
+        probabilities = compute_expected_eye_color_probabilities(
+            data.iloc[:, 3], data.iloc[:, 4], dosages)
+    else:
+        probabilities = compute_eye_color_probabilities(
+            data.iloc[:, 3], data.iloc[:, 4], dosages)
+
+    results = describe_eye_colors(probabilities)
+
+    if len(results) == 1:
+        result = results[0]
+    else:
+        result = dict(zip(sample_names, results))
+
+    write_genome_app_output(result, rsids)
+
+
+def detect_eye_color(field='GT'):
+    """
+    :param field: str; .VCF FORMAT field to score: 'GT' (hard calls) | 'DS' |
+        'GP'; see detect_eye_color_from_dosages
+    Note:
+        If the variant is not seen in the VCF file, the individual is assumed to be homozygous for the major allele at
+        that loci.
+        If there is no VCF file but there is a consumer raw genotype file (input/person/genome.txt), genotypes are
+        read from it instead, searching the GRCh37 regions unless its header names build 38.
+    """
+
+    if field != 'GT':
+        return detect_eye_color_from_dosages(field=field)
+
+    vcf_file_path = join(PERSON_DIRECTORY_PATH, 'genome.vcf.gz')
+    raw_genotype_file_path = join(PERSON_DIRECTORY_PATH, 'genome.txt')
+    data = read_hirisplex_model()
+
+    genotype = list(DEFAULT_GENOTYPE)
+
+    if not isfile(vcf_file_path) and isfile(raw_genotype_file_path):
+
+        regions = get_hirisplex_regions(
+            data, get_raw_genotype_build(raw_genotype_file_path))
+
+        raw_genotypes = get_raw_genotypes(raw_genotype_file_path,
+                                          data.iloc[1:, 0], regions)
+
+        for i, (rsid, region, allele) in enumerate(
+                data.iloc[1:, 0:3].itertuples(index=False)):
+
+            if rsid in raw_genotypes:
+                genotype[i] = raw_genotypes[rsid].count(allele)
+
+    else:
+
+        for i, (rsid, region, allele) in enumerate(
+                data.iloc[1:, 0:3].itertuples(index=False)):
+
+            variant = get_vcf_variants_by_tabix(
+                vcf_file_path, query_str=region)
+
+            if variant and rsid in [x['ID'] for x in variant]:
+                genotype[i] = [x for x in variant if x['ID'] == rsid
+                               ][0]['sample'][0]['genotype'].count(allele)
+
+    probabilities = compute_eye_color_probabilities(
+        data.iloc[:, 3], data.iloc[:, 4], array([genotype], dtype=float))
+
+    write_genome_app_output(
+        describe_eye_colors(probabilities)[0], data.iloc[1:, 0])
@@ -0,0 +1,364 @@
+from collections import Counter
+from cProfile import Profile
+from functools import wraps
+from importlib import import_module
+from inspect import getsourcefile, getsourcelines
+from json import dump
+from os.path import join
+from pstats import Stats
+from time import perf_counter
+from tracemalloc import Filter, get_traced_memory, start, stop, take_snapshot
+
+PROFILE_MODES = [
+    'cprofile',
+    'tracemalloc',
+    'latency',
+]
+
+# (module name, function name) of VCF row parsing; tracemalloc keeps
+# allocations whose traceback passes through these functions
+TRACEMALLOC_FUNCTIONS = [
+    ('vcf', 'parse_vcf_row'),
+    ('vcf', 'update_vcf_variant_dict'),
+]
+
+# Frames stored per allocation; enough to reach TRACEMALLOC_FUNCTIONS from
+# comprehensions and variant.py helpers they call
+TRACEMALLOC_N_FRAMES = 4
+
+# (module name, function name) of VCF queries that parse rows and are
+# snapshotted by tracemalloc
+TRACEMALLOC_QUERY_FUNCTIONS = [
+    ('detect_eye_color', 'get_vcf_variants_by_tabix'),
+]
+
+# (module name, function name) of per-variant genotype lookups timed by
+# latency
+LATENCY_FUNCTIONS = [
+    ('detect_eye_color', 'get_vcf_variants_by_tabix'),
+    ('vcf', 'get_vcf_variant_allele_dosages_by_tabix'),
+    ('raw_genotype', 'search_raw_genotype_by_position'),
+    ('raw_genotype', 'search_raw_genotype_by_rsid'),
+]
+
+# Upper bounds (ms) of latency histogram bins; the last bin is unbounded
+LATENCY_BINS = [0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000]
+
+
+def parse_profile_modes(profile):
+    """
+    Parse profile modes.
+    :param profile: str | None; ',' separated: 'cprofile' | 'tracemalloc' |
+        'latency' | 'all'
+    :return: list; of str profile modes
+    """
+
+    if not profile:
+        return []
+
+    modes = [m.strip().lower() for m in profile.split(',') if m.strip()]
+
+    if 'all' in modes:
+        return list(PROFILE_MODES)
+
+    for m in modes:
+        if m not in PROFILE_MODES:
+            raise ValueError('Unknown profile mode {}; choose from {}.'.format(
+                m, PROFILE_MODES + ['all']))
+
+    return modes
+
+
+def parse_sample_every(sample_every):
+    """
+    Parse latency sampling rate.
+    :param sample_every: str | int | None; time 1 of every sample_every
+        lookups; 1 if None or ''
+    :return: int; sample_every >= 1
+    """
+
+    if sample_every is None or sample_every == '':
+        return 1
+
+    try:
+        parsed = int(sample_every)
+    except ValueError:
+        parsed = 0
+
+    if parsed < 1:
+        raise ValueError(
+            'sample_every must be an integer >= 1; got {}.'.format(
+                sample_every))
+
+    return parsed
+
+
+def patch_function(module_name, function_name, make_wrapper):
+    """
+    Replace module function with its wrapper.
+    :param module_name: str; module name
+    :param function_name: str; function name
+    :param make_wrapper: callable; takes the function and returns its wrapper
+    :return: callable; undo the replacement
+    """
+
+    module = import_module(module_name)
+    function = getattr(module, function_name)
+
+    setattr(module, function_name, wraps(function)(make_wrapper(function)))
+
+    return lambda: setattr(module, function_name, function)
+
+
+def get_function_lines(functions=TRACEMALLOC_FUNCTIONS):
+    """
+    Get source lines of functions.
+    :param functions: list; of (module name, function name)
+    :return: set; of (str file path, int line number)
+    """
+
+    function_lines = set()
+
+    for module_name, function_name in functions:
+
+        function = getattr(import_module(module_name), function_name)
+        lines, first_lineno = getsourcelines(function)
+
+        function_lines.update(
+            (getsourcefile(function), l)
+            for l in range(first_lineno, first_lineno + len(lines)))
+
+    return function_lines
+
+
+def make_tracemalloc_wrapper(sizes, counts, function_lines, n_queries):
+    """
+    Make wrapper factory adding the memory each call allocated (and still
+        holds when it returns, e.g. the parsed variants it returns) under
+        function_lines.
+    :param sizes: Counter; to add allocation site size differences (B) to
+    :param counts: Counter; to add allocation site block count differences to
+    :param function_lines: set; of (str file path, int line number) an
+        allocation traceback must pass through
+    :param n_queries: list; [int]; incremented per call
+    :return: callable; takes a function and returns its wrapper
+    """
+
+    filters = [
+        Filter(True, file_path, all_frames=True)
+        for file_path in set(f for f, _ in function_lines)
+    ]
+
+    def make_wrapper(function):
+
+        def wrapper(*args, **kwargs):
+
+            n_queries[0] += 1
+
+            before = take_snapshot().filter_traces(filters)
+
+            returned = function(*args, **kwargs)
+
+            after = take_snapshot().filter_traces(filters)
+
+            for s in after.compare_to(before, 'traceback'):
+                frames = list(s.traceback)
+                if any((f.filename, f.lineno) in function_lines
+                       for f in frames):
+                    # Frames are ordered from the oldest to the most recent,
+                    # the allocation site
+                    site = str(frames[-1])
+                    sizes[site] += s.size_diff
+                    counts[site] += s.count_diff
+
+            return returned
+
+        return wrapper
+
+    return make_wrapper
+
+
+def make_latency_wrapper(latencies, sample_every):
+    """
+    Make wrapper factory recording latency of every sample_every-th call.
+    :param latencies: list; to append (function name, ms) to
+    :param sample_every: int; record 1 of every sample_every calls
+    :return: callable; takes a function and returns its wrapper
+    """
+
+    def make_wrapper(function):
+
+        n_calls = [0]
+
+        def wrapper(*args, **kwargs):
+
+            n_calls[0] += 1
+            if (n_calls[0] - 1) % sample_every:
+                return function(*args, **kwargs)
+
+            start_time = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                latencies.append((function.__name__,
+                                  (perf_counter() - start_time) * 1000))
+
+        return wrapper
+
+    return make_wrapper
+
+
+def make_latency_histogram(latencies, bins=LATENCY_BINS):
+    """
+    Make latency histogram per function.
+    :param latencies: list; of (function name, ms)
+    :param bins: list; of float upper bounds (ms) of histogram bins
+    :return: dict; {function name: {'n', 'min_ms', 'median_ms', 'max_ms',
+        'histogram': {bin: count}}}
+    """
+
+    histograms = {}
+
+    for name in sorted(set(n for n, _ in latencies)):
+
+        ms = sorted(t for n, t in latencies if n == name)
+
+        histogram = {'<={}ms'.format(b): 0 for b in bins}
+        histogram['>{}ms'.format(bins[-1])] = 0
+        for t in ms:
+            for b in bins:
+                if t <= b:
+                    histogram['<={}ms'.format(b)] += 1
+                    break
+            else:
+                histogram['>{}ms'.format(bins[-1])] += 1
+
+        histograms[name] = {
+            'n': len(ms),
+            'min_ms': ms[0],
+            'median_ms': ms[len(ms) // 2],
+            'max_ms': ms[-1],
+            'histogram': histogram,
+        }
+
+    return histograms
+
+
+def profile_genome_app(function,
+                       modes,
+                       output_directory_path,
+                       sample_every=1,
+                       n_top=25):
+    """
+    Run function under profile modes and write their artifacts to
+        output_directory_path:
+            cprofile: profile.pstats (and profile.txt, sorted by cumulative
+                time)
+            tracemalloc: tracemalloc.txt; top allocation sites under
+                parse_vcf_row & update_vcf_variant_dict
+            latency: latency.json; per-variant lookup latency histograms
+        Each mode runs function in a pass of its own.
+    :param function: callable; function to run without arguments
+    :param modes: list; of str profile modes; see PROFILE_MODES
+    :param output_directory_path: str; directory to write artifacts to
+    :param sample_every: int; time 1 of every sample_every lookups; >= 1
+    :param n_top: int; number of functions or allocation sites to summarize
+    :return: None
+    """
+
+    if not modes:
+        return function()
+
+    sample_every = parse_sample_every(sample_every)
+
+    # Tracing every allocation (tracemalloc) or call (cprofile) slows every
+    # call; run each mode in its own pass so none inflates another's timings
+    if 1 < len(modes):
+        for mode in modes:
+            profile_genome_app(function, [mode], output_directory_path,
+                               sample_every, n_top)
+        return
+
+    undos = []
+    latencies = []
+    sizes, counts = Counter(), Counter()
+    n_queries = [0]
+
+    if 'latency' in modes:
+        for module_name, function_name in LATENCY_FUNCTIONS:
+            undos.append(
+                patch_function(module_name, function_name,
+                               make_latency_wrapper(latencies, sample_every)))
+
+    if 'tracemalloc' in modes:
+        function_lines = get_function_lines()
+        for module_name, function_name in TRACEMALLOC_QUERY_FUNCTIONS:
+            undos.append(
+                patch_function(module_name, function_name,
+                               make_tracemalloc_wrapper(
+                                   sizes, counts, function_lines,
+                                   n_queries)))
+        start(TRACEMALLOC_N_FRAMES)
+
+    if 'cprofile' in modes:
+        profile = Profile()
+        profile.enable()
+
+    try:
+        function()
+
+    finally:
+
+        if 'cprofile' in modes:
+            profile.disable()
+
+            pstats_file_path = join(output_directory_path, 'profile.pstats')
+            profile.dump_stats(pstats_file_path)
+
+            with open(join(output_directory_path, 'profile.txt'), 'w') as f:
+                Stats(profile, stream=f).sort_stats('cumulative').print_stats(
+                    n_top)
+
+            print('Profiled to {}.'.format(pstats_file_path))
+
+        for undo in reversed(undos):
+            undo()
+
+        if 'tracemalloc' in modes:
+            current, peak = get_traced_memory()
+            stop()
+
+            tracemalloc_file_path = join(output_directory_path,
+                                         'tracemalloc.txt')
+            with open(tracemalloc_file_path, 'w') as f:
+                f.write('Traced memory: current={} B, peak={} B\n'.format(
+                    current, peak))
+                f.write('Top {} allocation sites under {}; memory each query '
+                        'allocated and still held when it returned, summed '
+                        'over queries:\n'.format(n_top, ', '.join(
+                            '{}.{}'.format(m, n)
+                            for m, n in TRACEMALLOC_FUNCTIONS)))
+                if n_queries[0]:
+                    for site, size in sizes.most_common(n_top):
+                        f.write('{}: size={} B, count={}\n'.format(
+                            site, size, counts[site]))
+                else:
+                    f.write('No traced queries ran; VCF rows are parsed '
+                            'only through {}, when scoring GT from a VCF, not '
+                            'for DS/GP or raw genotype files.\n'.format(
+                                ', '.join(
+                                    '{}.{}'.format(m, n)
+                                    for m, n in TRACEMALLOC_QUERY_FUNCTIONS)))
+
+            print('Traced allocations to {}.'.format(tracemalloc_file_path))
+
+        if 'latency' in modes:
+            latency_file_path = join(output_directory_path, 'latency.json')
+            with open(latency_file_path, 'w') as f:
+                dump(
+                    make_latency_histogram(latencies),
+                    f,
+                    indent=2,
+                    sort_keys=True)
+
+            print('Timed queries to {}.'.format(latency_file_path))
@@ -0,0 +1,327 @@
+from mmap import ACCESS_READ, mmap
+from os.path import getmtime, getsize, isfile
+from re import IGNORECASE, compile
+
+from numpy import array, load, save, uint64
+
+RAW_GENOTYPE_COLUMNS = [
+    'rsid',
+    'chromosome',
+    'position',
+    'genotype',
+    # AncestryDNA splits genotype into allele1 & allele2
+]
+
+CHROMOSOME_ORDER = {
+    **{str(i): i for i in range(1, 23)},
+    'X': 23,
+    'Y': 24,
+    'XY': 25,
+    'MT': 26,
+    'M': 26,
+    # AncestryDNA numbers sex & mitochondrial chromosomes
+    '23': 23,
+    '24': 24,
+    '25': 25,
+    '26': 26,
+}
+
+# Alleles of a called genotype; D & I are deletion & insertion
+RAW_GENOTYPE_ALLELES = set('ACGTDI')
+
+RSID_INDEX_SUFFIX = '.rsidx.npy'
+
+# Genome build named in raw genotype file header comments, e.g.
+# '# ... human reference build 37 ...' (23andMe) or
+# '#... GRCh37/hg19 reference ...' (AncestryDNA)
+RAW_GENOTYPE_BUILD_PATTERN = compile(r'(?:build|GRCh)\s*(\d+)|hg(\d+)',
+                                     IGNORECASE)
+
+HG_BUILDS = {
+    '18': 36,
+    '19': 37,
+    '38': 38,
+}
+
+# 23andMe & AncestryDNA raw genotype files are GRCh37
+DEFAULT_RAW_GENOTYPE_BUILD = 37
+
+
+def get_raw_genotype_build(raw_genotype_file_path):
+    """
+    Get genome build of raw genotype file from its header comments.
+    :param raw_genotype_file_path: str; raw genotype file
+    :return: int; genome build: 37 | 38 | ...; DEFAULT_RAW_GENOTYPE_BUILD if
+        the header does not name one
+    """
+
+    with open(raw_genotype_file_path, 'rb') as f:
+        for line in f:
+
+            if not line.startswith(b'#'):
+                break
+
+            match = RAW_GENOTYPE_BUILD_PATTERN.search(
+                line.decode(errors='replace'))
+            if match:
+                build, hg = match.groups()
+                if build:
+                    return int(build)
+                if hg in HG_BUILDS:
+                    return HG_BUILDS[hg]
+
+    return DEFAULT_RAW_GENOTYPE_BUILD
+
+
+def get_raw_genotypes(raw_genotype_file_path, rsids, regions):
+    """
+    Get genotypes from a sorted consumer raw genotype file (23andMe,
+        AncestryDNA, ...) without parsing the whole file.
+    Each variant is first looked up by binary search on its position, then,
+        if not found there, by its rsID through the rsID index. Regions must
+        be in the file's genome build (see get_raw_genotype_build) for the
+        binary search to find them.
+    :param raw_genotype_file_path: str; tab-separated rsid, chromosome,
+        position, genotype file sorted by chromosome & position
+    :param rsids: iterable; (n_variants); of str variant IDs
+    :param regions: iterable; (n_variants); of str genomic regions:
+        'chr:start-end'
+    :return: dict; {rsid: genotype}; genotype is str of allele sequences
+        (e.g. 'AG'); variants not seen or not called (e.g. '--' or '00') are
+        left out
+    """
+
+    genotypes = {}
+
+    # mmap cannot map an empty file; score it like a header-only file
+    if not getsize(raw_genotype_file_path):
+        return genotypes
+
+    with open(raw_genotype_file_path, 'rb') as f, mmap(
+            f.fileno(), 0, access=ACCESS_READ) as m:
+
+        rsid_index = None
+
+        for rsid, region in zip(rsids, regions):
+
+            chrom, start_end = region.split(':')
+            start = int(start_end.split('-')[0])
+
+            row = search_raw_genotype_by_position(m, rsid, chrom, start)
+
+            if row is None:
+                if rsid_index is None:
+                    rsid_index = get_rsid_index(raw_genotype_file_path, m)
+                row = search_raw_genotype_by_rsid(m, rsid, rsid_index)
+
+            if row is not None:
+                genotype = get_raw_genotype(row)
+                if genotype is not None:
+                    genotypes[rsid] = genotype
+
+    return genotypes
+
+
+def parse_raw_genotype_row(line):
+    """
+    Parse raw genotype line.
+    :param line: bytes; raw genotype line
+    :return: list | None; of str fields; None if line is a comment or header
+    """
+
+    line = line.strip()
+
+    if not line or line.startswith(b'#') or line.startswith(b'rsid'):
+        return None
+
+    return line.decode().split('\t')
+
+
+def get_raw_genotype(row):
+    """
+    Get called genotype of raw genotype row.
+    :param row: list; of str fields
+    :return: str | None; genotype (e.g. 'AG'); None if not called ('--' in
+        23andMe, '0' alleles in AncestryDNA) or not made of A, C, G, T, D, & I
+    """
+
+    genotype = ''.join(row[3:]).strip()
+
+    if genotype and set(genotype) <= RAW_GENOTYPE_ALLELES:
+        return genotype
+
+
+def get_raw_genotype_row_key(row):
+    """
+    Get raw genotype row sort key.
+    :param row: list; of str fields
+    :return: tuple; (chromosome order, position)
+    """
+
+    return CHROMOSOME_ORDER.get(row[1], len(CHROMOSOME_ORDER)), int(row[2])
+
+
+def read_raw_genotype_line(m, offset):
+    """
+    Read the first full line starting at or after offset.
+    :param m: mmap; raw genotype file
+    :param offset: int; byte offset
+    :return: int & bytes; line start offset & line; -1 & b'' if past the end
+    """
+
+    if offset:
+        offset = m.find(b'\n', offset - 1)
+        if offset == -1:
+            return -1, b''
+        offset += 1
+
+    if len(m) <= offset:
+        return -1, b''
+
+    end = m.find(b'\n', offset)
+    if end == -1:
+        end = len(m)
+
+    return offset, m[offset:end]
+
+
+def search_raw_genotype_by_position(m, rsid, chrom, position):
+    """
+    Binary search raw genotype file for variant at position.
+    :param m: mmap; raw genotype file
+    :param rsid: str; variant ID
+    :param chrom: str; chromosome
+    :param position: int; position
+    :return: list | None; of str fields; None if not found
+    """
+
+    key = (CHROMOSOME_ORDER.get(chrom, len(CHROMOSOME_ORDER)), position)
+
+    # Find the smallest byte offset whose next full line is at or after key
+    lo, hi = 0, len(m)
+    while lo < hi:
+        mid = (lo + hi) // 2
+
+        # Skip comments and header
+        offset, line = read_raw_genotype_line(m, mid)
+        row = parse_raw_genotype_row(line)
+        while offset != -1 and row is None:
+            offset, line = read_raw_genotype_line(m, offset + len(line) + 1)
+            row = parse_raw_genotype_row(line)
+
+        if offset == -1 or key <= get_raw_genotype_row_key(row):
+            hi = mid
+        else:
+            lo = mid + 1
+
+    # Scan variants at position
+    offset, line = read_raw_genotype_line(m, lo)
+    while offset != -1:
+
+        row = parse_raw_genotype_row(line)
+
+        if row is not None:
+            if get_raw_genotype_row_key(row) != key:
+                break
+            if row[0] == rsid:
+                return row
+
+        offset, line = read_raw_genotype_line(m, offset + len(line) + 1)
+
+
+def get_rsid_number(rsid):
+    """
+    Get rsID number.
+    :param rsid: str | bytes; rsID: 'rs123'
+    :return: int | None; rsID number: 123; None if not an rsID
+    """
+
+    if isinstance(rsid, bytes):
+        rsid = rsid.decode(errors='replace')
+
+    if rsid.startswith('rs') and rsid[2:].isdigit():
+        return int(rsid[2:])
+
+
+def make_rsid_index(m):
+    """
+    Make rsID index of raw genotype file.
+    :param m: mmap; raw genotype file
+    :return: ndarray; (n_rsids, 2); [rsID number, line offset]; sorted by rsID
+        number
+    """
+
+    index = []
+
+    offset = 0
+    while offset < len(m):
+
+        end = m.find(b'\n', offset)
+        if end == -1:
+            end = len(m)
+
+        # Skip comments (their text may be long, tab-less, or not UTF-8)
+        if m[offset:offset + 2] == b'rs':
+            tab = m.find(b'\t', offset, end)
+            if tab == -1:
+                tab = end
+
+            rsid_number = get_rsid_number(m[offset:tab])
+            if rsid_number is not None:
+                index.append((rsid_number, offset))
+
+        offset = end + 1
+
+    index.sort()
+
+    return array(index, dtype=uint64).reshape(-1, 2)
+
+
+def get_rsid_index(raw_genotype_file_path, m):
+    """
+    Get rsID index of raw genotype file, reading it from
+        <raw_genotype_file_path>.rsidx.npy if it is up to date or else making
+        it and saving it there.
+    :param raw_genotype_file_path: str; raw genotype file
+    :param m: mmap; raw genotype file
+    :return: ndarray; (n_rsids, 2); [rsID number, line offset]; sorted by rsID
+        number
+    """
+
+    index_file_path = raw_genotype_file_path + RSID_INDEX_SUFFIX
+
+    if isfile(index_file_path) and getmtime(
+            raw_genotype_file_path) <= getmtime(index_file_path):
+        return load(index_file_path, mmap_mode='r')
+
+    index = make_rsid_index(m)
+
+    try:
+        save(index_file_path, index)
+    except OSError:
+        print('Could not save rsID index {}.'.format(index_file_path))
+
+    return index
+
+
+def search_raw_genotype_by_rsid(m, rsid, rsid_index):
+    """
+    Search raw genotype file for variant by rsID.
+    :param m: mmap; raw genotype file
+    :param rsid: str; variant ID
+    :param rsid_index: ndarray; (n_rsids, 2); [rsID number, line offset];
+        sorted by rsID number
+    :return: list | None; of str fields; None if not found
+    """
+
+    rsid_number = get_rsid_number(rsid)
+    if rsid_number is None or not len(rsid_index):
+        return None
+
+    i = rsid_index[:, 0].searchsorted(uint64(rsid_number))
+    if i == len(rsid_index) or rsid_index[i, 0] != rsid_number:
+        return None
+
+    _, line = read_raw_genotype_line(m, int(rsid_index[i, 1]))
+
+    return parse_raw_genotype_row(line)
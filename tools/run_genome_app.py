@@ -3,26 +3,102 @@ Genome App entry point.
 File for running Genome App from either:
     1) Genome AI or
     2) command line ($ python run_genome_app.py).
+
+Genotypes are scored from GT hard calls unless either:
+    1) environment variable GENOME_APP_FIELD=DS | GP or
+    2) command line ($ python run_genome_app.py --field DS)
+selects imputed dosages or genotype probabilities.
+
+Profiling is opt-in through either:
+    1) environment variable GENOME_APP_PROFILE=cprofile,tracemalloc,latency or
+    2) command line ($ python run_genome_app.py --profile all).
+Latency profiling times 1 of every N lookups, N set by either:
+    1) environment variable GENOME_APP_PROFILE_SAMPLE_EVERY=N or
+    2) command line ($ python run_genome_app.py --profile-sample-every N).
+Profiling artifacts are written to <genome-app-repository>/output/.
 """
 
+from os import environ
+
+
+FIELDS = [
+    'GT',
+    'DS',
+    'GP',
+]
 
-def run_genome_app():
+
+def run_genome_app(field=None, profile=None, profile_sample_every=None):
     """
     Required function for Genome AI to run this Genome App. This Genome App is
         responsible for producing either:
             1) <genome-app-repository>/output/output.json or
             2) <genome-app-repository>/output/output.g2p.
     Arguments:
-        None
+        field: str; .VCF FORMAT field to score: 'GT' | 'DS' | 'GP'; defaults
+            to environment variable GENOME_APP_FIELD, or 'GT'
+        profile: str; ',' separated profile modes: 'cprofile' | 'tracemalloc'
+            | 'latency' | 'all'; defaults to environment variable
+            GENOME_APP_PROFILE
+        profile_sample_every: int; time 1 of every profile_sample_every
+            lookups; defaults to environment variable
+            GENOME_APP_PROFILE_SAMPLE_EVERY, or 1
     Returns:
         None
     """
 
-    from detect_eye_color import detect_eye_color
+    from functools import partial
+
+    from detect_eye_color import OUTPUT_DIRECTORY_PATH, detect_eye_color
+
+    if field is None:
+        field = environ.get('GENOME_APP_FIELD') or 'GT'
+    field = field.upper()
+    if field not in FIELDS:
+        raise ValueError('Unknown field {}; choose from {}.'.format(
+            field, FIELDS))
 
-    detect_eye_color()
+    if profile is None:
+        profile = environ.get('GENOME_APP_PROFILE')
+
+    if profile_sample_every is None:
+        profile_sample_every = environ.get('GENOME_APP_PROFILE_SAMPLE_EVERY')
+
+    if not profile:
+        detect_eye_color(field=field)
+        return
+
+    from profiling import (parse_profile_modes, parse_sample_every,
+                           profile_genome_app)
+
+    profile_genome_app(
+        partial(detect_eye_color, field=field),
+        parse_profile_modes(profile),
+        OUTPUT_DIRECTORY_PATH,
+        sample_every=parse_sample_every(profile_sample_every))
 
 
 if __name__ == '__main__':
 
-    run_genome_app()
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    parser.add_argument(
+        '--field',
+        type=str.upper,
+        choices=FIELDS,
+        help='.VCF FORMAT field to score: GT (hard calls) | DS | GP')
+    parser.add_argument(
+        '--profile',
+        help="',' separated: cprofile | tracemalloc | latency | all")
+    parser.add_argument(
+        '--profile-sample-every',
+        type=int,
+        help='time 1 of every N lookups when profiling latency (>= 1)')
+
+    args = parser.parse_args()
+
+    run_genome_app(
+        field=args.field,
+        profile=args.profile,
+        profile_sample_every=args.profile_sample_every)
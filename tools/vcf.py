@@ -1,4 +1,8 @@
+from builtins import open as builtin_open
+from gzip import open as gzip_open
+from math import isfinite
 from tabix import open
+from numpy import full, nan
 from variant import (describe_clnsig, get_start_and_end_positions,
                      get_variant_classification, get_variant_type)
 
@@ -277,3 +281,176 @@ def get_vcf_population_allelic_frequencies(caf):
         return [
             float(a_caf) for a_caf in caf.split(',') if a_caf and a_caf != '.'
         ]
+
+
+def get_vcf_sample_names(vcf_file_path):
+    """
+    Get .VCF sample names from the #CHROM header line.
+    :param vcf_file_path: str; .VCF or bgzipped .VCF
+    :return: list; of str sample names
+    """
+
+    open_ = gzip_open if vcf_file_path.endswith('.gz') else builtin_open
+
+    with open_(vcf_file_path, 'rt') as f:
+        for line in f:
+            if line.startswith('#CHROM'):
+                return line.rstrip('\r\n').split('\t')[9:]
+            if not line.startswith('#'):
+                break
+
+    return []
+
+
+def get_vcf_allele_dosage(ref, alt, allele, field, format_, sample):
+    """
+    Get .VCF sample dosage of allele from DS, GP, or GT.
+    :param ref: str; reference allele
+    :param alt: str; alternate allele
+    :param allele: str; allele to count
+    :param field: str; .VCF FORMAT field: 'DS' | 'GP' | 'GT'
+    :param format_: str; .VCF FORMAT
+    :param sample: str; .VCF sample
+    :return: float | list | None; allele dosage ('DS' | 'GT') or
+        [P(0 allele), P(1 allele), P(2 allele)] ('GP'); None if allele is
+        neither REF nor the (single) ALT, or if field is missing, partially
+        missing (e.g. GT '0/.' or GP '0.5,.,0.5'), not a number, not diploid
+        (e.g. GP with 2 values), or GP summing to 0
+    """
+
+    format_split = format_.split(':')
+    sample_split = sample.split(':')
+    if field not in format_split or len(sample_split) <= format_split.index(
+            field):
+        return None
+
+    value = sample_split[format_split.index(field)]
+    if value.startswith('.'):
+        return None
+
+    if field == 'GT':
+        if '.' in value.replace('/', '|').split('|'):
+            return None
+        return float(get_vcf_genotype(ref, alt, gt=value).count(allele))
+
+    # DS and GP describe the ALT allele; flip them when counting REF
+    if allele == alt:
+        flipped = False
+    elif allele == ref:
+        flipped = True
+    else:
+        return None
+
+    try:
+        numbers = [float(a_value) for a_value in value.split(',')]
+    except ValueError:  # Partially missing (e.g. GP '0.5,.,0.5') or malformed
+        return None
+    if not all(isfinite(n) for n in numbers):
+        return None
+
+    if field == 'DS':
+        if len(numbers) != 1:
+            return None
+        ds = numbers[0]
+        return 2 - ds if flipped else ds
+
+    else:  # field == 'GP'
+        gp = numbers
+        if len(gp) != 3 or sum(gp) <= 0:
+            return None
+        return gp[::-1] if flipped else gp
+
+
+def get_vcf_variant_allele_dosages_by_tabix(sample_vcf, rsid, region, allele,
+                                            field):
+    """
+    Get .VCF allele dosages of all samples for a variant by tabix.
+    :param sample_vcf: pytabix handler;
+    :param rsid: str; variant ID
+    :param region: str; genomic region: 'chr:start-end'
+    :param allele: str; allele to count
+    :param field: str; .VCF FORMAT field: 'DS' | 'GP' | 'GT'
+    :return: list | None; (n_samples); of allele dosages (see
+        get_vcf_allele_dosage); None if the variant is not seen
+    """
+
+    for vcf_row in sample_vcf.querys(region):
+
+        if vcf_row[2] != rsid:
+            continue
+
+        ref, alt, format_ = vcf_row[3], vcf_row[4], vcf_row[8]
+
+        return [
+            get_vcf_allele_dosage(ref, alt, allele, field, format_, s)
+            for s in vcf_row[9:]
+        ]
+
+
+def get_vcf_allele_dosages_by_tabix(sample_vcf,
+                                    rsids,
+                                    regions,
+                                    alleles,
+                                    field='DS',
+                                    default_dosages=None,
+                                    n_samples=None):
+    """
+    Get .VCF allele dosages of all samples for a panel of variants by tabix.
+    Only CHROM, POS, ID, REF, ALT, FORMAT, and samples are read; INFO is not
+        parsed.
+    :param sample_vcf: str or pytabix handler;
+    :param rsids: iterable; (n_variants); of str variant IDs
+    :param regions: iterable; (n_variants); of str genomic regions:
+        'chr:start-end'
+    :param alleles: iterable; (n_variants); of str alleles to count
+    :param field: str; .VCF FORMAT field: 'DS' | 'GP' | 'GT'
+    :param default_dosages: iterable; (n_variants); of int allele counts used
+        for variants not seen in the .VCF; NaN if None
+    :param n_samples: int; number of samples (see get_vcf_sample_names); the
+        most samples in a queried row if None
+    :return: ndarray; (n_samples, n_variants) allele dosages ('DS' | 'GT') or
+        (n_samples, n_variants, 3) genotype probabilities ('GP')
+    """
+
+    if isinstance(sample_vcf, str):  # Open sample .VCF
+        sample_vcf = open(sample_vcf)
+
+    rsids, regions, alleles = list(rsids), list(regions), list(alleles)
+
+    # Variant index -> list of per-sample dosages
+    dosages = {}
+    n_row_samples = 0
+
+    for i, (rsid, region, allele) in enumerate(zip(rsids, regions, alleles)):
+
+        variant_dosages = get_vcf_variant_allele_dosages_by_tabix(
+            sample_vcf, rsid, region, allele, field)
+
+        if variant_dosages is not None:
+            n_row_samples = max(n_row_samples, len(variant_dosages))
+            dosages[i] = variant_dosages
+
+    n_variants = len(rsids)
+
+    if n_samples is None:
+        n_samples = n_row_samples
+
+    if field == 'GP':
+        array_ = full((n_samples, n_variants, 3), nan)
+    else:
+        array_ = full((n_samples, n_variants), nan)
+
+    if default_dosages is not None:
+        for i, d in enumerate(default_dosages):
+            if field == 'GP':
+                array_[:, i, :] = 0
+                array_[:, i, int(d)] = 1
+            else:
+                array_[:, i] = d
+
+    for i, sample_dosages in dosages.items():
+        for j, d in enumerate(sample_dosages[:n_samples]):
+            if d is not None:
+                array_[j, i] = d
+
+    return array_